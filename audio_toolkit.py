@@ -1,9 +1,19 @@
 import gradio as gr
 import os
 import subprocess
-from pathlib import Path
 import json
 import concurrent.futures
+import functools
+import importlib.util
+import tempfile
+import types
+
+# orjson parses ffprobe output faster when installed; its errors subclass json.JSONDecodeError
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 
 # Minimal helper to surface a concise ffmpeg/ffprobe error message
 def _last_stderr_line(proc_error: subprocess.CalledProcessError) -> str:
@@ -17,17 +27,49 @@ def _last_stderr_line(proc_error: subprocess.CalledProcessError) -> str:
         pass
     return ""
 
-# Add mutagen for metadata tagging
-try:
-    from mutagen.easyid3 import EasyID3
-    from mutagen.id3 import ID3NoHeaderError
-    from mutagen.mp4 import MP4
-    from mutagen.flac import FLAC
-    from mutagen.oggvorbis import OggVorbis
-    from mutagen.asf import ASF
-    MUTAGEN_AVAILABLE = True
-except ImportError:
-    MUTAGEN_AVAILABLE = False
+
+# Shared sink for ffmpeg stdout instead of a fresh /dev/null per spawn
+_DEVNULL = open(os.devnull, 'wb')
+
+
+# Keep ffmpeg's stderr to real errors: no banner, no per-frame progress
+_QUIET_ARGS = ['-hide_banner', '-loglevel', 'error', '-nostats']
+
+
+def _run_ffmpeg(cmd, input=None):
+    """Run an ffmpeg command. Returns (ok, last stderr line on failure)."""
+    cmd = cmd[:1] + _QUIET_ARGS + cmd[1:]
+    try:
+        subprocess.run(cmd, input=input, stdout=_DEVNULL, stderr=subprocess.PIPE, check=True)
+        return True, ""
+    except subprocess.CalledProcessError as e:
+        return False, _last_stderr_line(e)
+
+# Add mutagen for metadata tagging and the MP4 codec fast path. Only its presence is
+# checked at startup; the format modules are imported by the first _mutagen() call.
+MUTAGEN_AVAILABLE = importlib.util.find_spec('mutagen') is not None
+
+
+@functools.lru_cache(maxsize=None)
+def _mutagen():
+    """The mutagen classes used here (imported once), or None when mutagen is unavailable."""
+    global MUTAGEN_AVAILABLE
+    if not MUTAGEN_AVAILABLE:
+        return None
+    try:
+        from mutagen.id3 import ID3, APIC, TIT2, ID3NoHeaderError
+        from mutagen.mp4 import MP4, MP4Cover
+        from mutagen.flac import FLAC, Picture
+        from mutagen.oggvorbis import OggVorbis
+        from mutagen.asf import ASF
+    except ImportError:
+        MUTAGEN_AVAILABLE = False
+        return None
+    return types.SimpleNamespace(
+        ID3=ID3, APIC=APIC, TIT2=TIT2, ID3NoHeaderError=ID3NoHeaderError,
+        MP4=MP4, MP4Cover=MP4Cover, FLAC=FLAC, Picture=Picture,
+        OggVorbis=OggVorbis, ASF=ASF,
+    )
 
 # ------------------------------------------------------------------
 # Original helper functions (these would need to be accessible in your Gradio environment)
@@ -35,99 +77,205 @@ except ImportError:
 AUDIO_EXTS = ('.mp3', '.m4a', '.aac', '.flac', '.wav', '.opus')
 IMAGE_EXTS = ('.jpg', '.jpeg', '.png')
 VIDEO_EXTS = ('.mp4', '.mkv', '.avi', '.mov', '.flv', '.wmv')
+# Set forms for `suffix in ...` checks; the tuples stay for str.endswith
+AUDIO_EXT_SET = frozenset(AUDIO_EXTS)
+VIDEO_EXT_SET = frozenset(VIDEO_EXTS)
+MEDIA_EXT_SET = VIDEO_EXT_SET | AUDIO_EXT_SET
+# Output containers that can carry an attached_pic cover written directly by ffmpeg
+COVER_EXTS = ('mp3', 'm4a', 'flac')
+
+# Output options marking stream v:0 as the embedded cover picture
+_COVER_STREAM_ARGS = [
+    '-disposition:v:0', 'attached_pic',
+    '-metadata:s:v:0', 'title=Album cover',
+    '-metadata:s:v:0', 'comment=Cover (front)',
+]
+
+# Input-side probing limits for the first-frame grab only, which just needs the first video
+# stream. Audio extraction keeps ffmpeg's defaults (5 MB / 5 s): in MKV/AVI/FLV an audio
+# stream can first appear past 1 MB and would then be missing its codec parameters.
+FAST_PROBE_ARGS = ['-probesize', '1M', '-analyzeduration', '1M']
+
+# Grabbing a single frame: one decoder thread, keyframes only, no audio/subtitle/data streams
+FIRST_FRAME_INPUT_ARGS = ['-threads', '1', '-skip_frame', 'nokey']
+FIRST_FRAME_OUTPUT_ARGS = ['-an', '-sn', '-dn', '-map_metadata', '-1', '-frames:v', '1', '-q:v', '2']
 
 # Get the directory where this script is located
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # Metadata tagging constants
 PREFIX = "[MapleStory BGM] "  # what to strip from filenames
+_PREFIX_LEN = len(PREFIX)
 
-def set_title_from_filename(audio_path):
-    """Set the TITLE tag with the prefix removed. Supports multiple audio formats."""
-    if not MUTAGEN_AVAILABLE:
+
+def _id3_padding(info):
+    """Keep at least 1 KiB of ID3 padding so later tag edits are rewritten in place."""
+    return max(1024, info.padding)
+
+def _tag_mp3(audio_path, title):
+    # Handle MP3 files with ID3 tags; TIT2 is written directly rather than through EasyID3's key mapping
+    m = _mutagen()
+    try:
+        tags = m.ID3(audio_path)
+    except m.ID3NoHeaderError:
+        tags = m.ID3()  # a fresh tag is written on the single save below
+    else:
+        frame = tags.get("TIT2")
+        if frame is not None and frame.text == [title]:
+            return  # already tagged; skip the rewrite
+    tags.setall("TIT2", [m.TIT2(encoding=3, text=[title])])
+    tags.save(audio_path, padding=_id3_padding)
+
+
+def _tag_generic(load, key, audio_path, title):
+    audio = load(audio_path)
+    if audio.get(key) == [title]:
+        return  # already tagged; skip the rewrite
+    audio[key] = [title]
+    audio.save()
+
+
+# file extension -> title writer. Loaders are lambdas so mutagen is only
+# imported when a file of that type is tagged.
+_TAGGERS = {
+    '.mp3': _tag_mp3,
+    '.m4a': functools.partial(_tag_generic, lambda p: _mutagen().MP4(p), '\xa9nam'),  # M4A title tag
+    '.mp4': functools.partial(_tag_generic, lambda p: _mutagen().MP4(p), '\xa9nam'),
+    '.flac': functools.partial(_tag_generic, lambda p: _mutagen().FLAC(p), 'title'),
+    '.ogg': functools.partial(_tag_generic, lambda p: _mutagen().OggVorbis(p), 'title'),
+    '.wma': functools.partial(_tag_generic, lambda p: _mutagen().ASF(p), 'WM/Title'),
+}
+
+
+def set_title_from_filename(audio_path, stem=None):
+    """Set the TITLE tag with the prefix removed. Supports multiple audio formats.
+
+    `stem` is the file name without extension when the caller already has it.
+    """
+    if _mutagen() is None:
         return False, "Mutagen library not available for metadata tagging"
     
     if not audio_path or not os.path.exists(audio_path):
         return False, f"Audio file not found: {audio_path}"
     
     # Get file extension to determine format
-    file_ext = os.path.splitext(audio_path)[1].lower()
-    basename = os.path.splitext(os.path.basename(audio_path))[0]
-    new_title = basename.removeprefix(PREFIX)  # Python 3.9+
+    root, file_ext = os.path.splitext(audio_path)
+    file_ext = file_ext.lower()
+    tagger = _TAGGERS.get(file_ext)
+    if tagger is None:
+        return False, f"Unsupported audio format: {file_ext}"
+    basename = stem if stem is not None else os.path.basename(root)
+    new_title = basename[_PREFIX_LEN:] if basename.startswith(PREFIX) else basename
     
     try:
-        if file_ext == '.mp3':
-            # Handle MP3 files with ID3 tags
-            try:
-                audio = EasyID3(audio_path)
-            except ID3NoHeaderError:
-                audio = EasyID3()
-                audio.save(audio_path)
-                audio = EasyID3(audio_path)
-            
-            audio["title"] = [new_title]
-            audio.save(audio_path)
-            
-        elif file_ext in ['.m4a', '.mp4']:
-            # Handle M4A/MP4 files
-            audio = MP4(audio_path)
-            audio['\xa9nam'] = [new_title]  # M4A title tag
-            audio.save()
-            
-        elif file_ext == '.flac':
-            # Handle FLAC files
-            audio = FLAC(audio_path)
-            audio['title'] = [new_title]
-            audio.save()
-            
-        elif file_ext == '.ogg':
-            # Handle OGG files
-            audio = OggVorbis(audio_path)
-            audio['title'] = [new_title]
-            audio.save()
-            
-        elif file_ext == '.wma':
-            # Handle WMA files
-            audio = ASF(audio_path)
-            audio['WM/Title'] = [new_title]
-            audio.save()
-            
-        else:
-            return False, f"Unsupported audio format: {file_ext}"
-        
+        tagger(audio_path, new_title)
         return True, f"title = {new_title} ({file_ext})"
-        
     except Exception as e:
         return False, f"Error setting metadata for {file_ext}: {e}"
 
-def get_audio_codec(video_file):
-    cmd = [
-        'ffprobe', '-v', 'error', '-select_streams', 'a:0',
-        '-show_entries', 'stream=codec_name',
-        '-of', 'default=noprint_wrappers=1:nokey=1',
-        video_file
-    ]
+# mutagen MP4Info.codec -> ffmpeg codec_name
+_MP4_CODECS = {
+    'mp4a.40': 'aac', 'mp4a.66': 'aac', 'mp4a.67': 'aac', 'mp4a.68': 'aac',
+    'mp4a.69': 'mp3', 'mp4a.6B': 'mp3',
+    'alac': 'alac', 'ac-3': 'ac3', 'ec-3': 'eac3', 'fLaC': 'flac', 'Opus': 'opus',
+}
+
+
+def _mp4_audio_codec(video_file):
+    """Read the first audio track's codec from the MP4 sample table without spawning ffprobe.
+
+    This imports mutagen on the plain extraction path too: one import per process is far
+    cheaper than the ffprobe spawn it replaces for every MP4/M4A/MOV input.
+    """
+    m = _mutagen()
+    if m is None:
+        return None
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        return result.stdout.strip()
-    except subprocess.CalledProcessError:
-        return "??"  # Indicate failure to get codec
+        codec = m.MP4(video_file).info.codec
+    except Exception:
+        return None
+    return _MP4_CODECS.get(codec) or _MP4_CODECS.get(codec[:7])
 
 
-def ffprobe_audio_streams(input_path):
+def _stat_key(path):
+    """(abs path, mtime_ns, size) so cached probes are dropped when a file changes."""
+    st = os.stat(path)
+    return os.path.abspath(path), st.st_mtime_ns, st.st_size
+
+
+def probe_audio(input_path):
+    """{'streams': [audio stream dicts], 'format': {...}} from one ffprobe call.
+
+    Cached per file version and shared by every caller; treat the result as read-only.
+    """
+    try:
+        return _probe_audio_cached(*_stat_key(input_path))
+    except OSError:
+        return {'streams': [], 'format': {}}
+
+
+@functools.lru_cache(maxsize=512)
+def _probe_audio_cached(input_path, mtime_ns, size):
+    # Only the fields callers read; full -show_streams/-show_format output is many times larger
     cmd = [
-        'ffprobe', '-v', 'error', '-show_streams', '-select_streams', 'a',
+        'ffprobe', '-hide_banner', '-v', 'error', '-select_streams', 'a',
+        '-show_entries', 'stream=index,codec_name,channels,channel_layout:stream_tags=language'
+                         ':format=format_name,duration',
         '-of', 'json', input_path
     ]
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        data = json.loads(result.stdout or '{}')
-        streams = data.get('streams', [])
-        return streams
-    except subprocess.CalledProcessError:
-        return []
-    except json.JSONDecodeError:
-        return []
+        # Both parsers take the raw bytes; stderr is never read
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=_DEVNULL, check=True)
+        data = _json_loads(result.stdout or b'{}')
+    except (subprocess.CalledProcessError, json.JSONDecodeError):
+        data = {}
+    return {'streams': data.get('streams', []), 'format': data.get('format', {})}
+
+
+def get_audio_codec(video_file):
+    if os.path.splitext(video_file)[1].lower() in ('.mp4', '.m4a', '.mov'):
+        codec = _mp4_audio_codec(video_file)
+        if codec:
+            return codec
+    streams = probe_audio(video_file)['streams']
+    if not streams:
+        return "??"  # Indicate failure to get codec
+    return streams[0].get('codec_name', '??')
+
+
+_METADATA_ARGS = ['-map_metadata', '0']
+
+
+def _metadata_args(preserve_metadata):
+    """Global metadata mapping for an output, shared by every ffmpeg call site."""
+    return _METADATA_ARGS if preserve_metadata else []
+
+
+def _remove_quiet(path):
+    """Delete a (partial) output file, ignoring a missing file."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _existing_names(dirpath):
+    """File names already in dirpath, from one readdir, for skip-if-exists checks."""
+    try:
+        return set(os.listdir(dirpath))
+    except OSError:
+        return set()
+
+
+def _ffmpeg_thread_args(workers):
+    """-threads value for ffmpeg runs sharing the machine with `workers` parallel jobs."""
+    per_proc = max(1, (os.cpu_count() or workers) // max(1, workers))
+    return ['-threads', str(per_proc)]
+
+
+def ffprobe_audio_streams(input_path):
+    """Audio stream dicts for input_path (see probe_audio)."""
+    return probe_audio(input_path)['streams']
 
 
 def scan_file_tracks_and_channels(input_path):
@@ -147,120 +295,150 @@ def scan_file_tracks_and_channels(input_path):
     return "\n".join(lines)
 
 
+def scan_files_batch(paths, max_workers=0):
+    """Yield scan reports for many files in input order, each as soon as it is ready.
+
+    ffprobe takes a single input, so the probes run concurrently instead; each result is
+    cached per file version (see probe_audio), so rescanning unchanged files spawns nothing.
+    """
+    if not paths:
+        return
+    workers = max(1, min(max_workers or os.cpu_count() or 4, len(paths)))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(scan_file_tracks_and_channels, paths)
+
+
+# Map common codecs to container extension suitable for stream copy
+_CODEC_EXTS = {
+    'aac': 'm4a',
+    'alac': 'm4a',
+    'flac': 'flac',
+    'mp3': 'mp3',
+    'opus': 'opus',
+    'vorbis': 'ogg',
+    'pcm_s16le': 'wav',
+    'pcm_s24le': 'wav',
+    'pcm_s32le': 'wav',
+    'ac3': 'ac3',
+    'eac3': 'eac3',
+}
+# Output extension for the main audio track extracted by copy
+_EXT_MAP = {"aac": "m4a", "mp3": "mp3", "flac": "flac", "opus": "opus", "pcm_s16le": "wav", "pcm_s24le": "wav", "pcm_s32le": "wav"}
+# codec -> (encoder, extension) for the per-stream re-encode fallback
+_REENCODE_MAP = {
+    'aac': ('aac', 'm4a'),
+    'mp3': ('libmp3lame', 'mp3'),
+    'flac': ('flac', 'flac'),
+    'opus': ('libopus', 'opus'),
+}
+_PCM_CODECS = frozenset({
+    'pcm_s8', 'pcm_u8', 'pcm_s16le', 'pcm_s16be', 'pcm_s24le', 'pcm_s24be', 'pcm_s32le', 'pcm_s32be',
+    'pcm_f32le', 'pcm_f32be', 'pcm_f64le', 'pcm_f64be'
+})
+
+
 def codec_to_extension(codec_name):
-    # Map common codecs to container extension suitable for stream copy
-    mapping = {
-        'aac': 'm4a',
-        'alac': 'm4a',
-        'flac': 'flac',
-        'mp3': 'mp3',
-        'opus': 'opus',
-        'vorbis': 'ogg',
-        'pcm_s16le': 'wav',
-        'pcm_s24le': 'wav',
-        'pcm_s32le': 'wav',
-        'ac3': 'ac3',
-        'eac3': 'eac3',
-    }
-    return mapping.get(codec_name, 'm4a')
+    return _CODEC_EXTS.get(codec_name, 'm4a')
 
 
 def extract_all_audio_streams(input_path, output_dir, overwrite=False, preserve_metadata=True):
-    streams = ffprobe_audio_streams(input_path)
-    if not streams:
-        return [], ["  ❌ No audio streams found"]
-    created = []
-    msgs = []
-    base = os.path.splitext(os.path.basename(input_path))[0]
-    for idx, s in enumerate(streams):
-        codec = s.get('codec_name', 'unknown')
-        ext = codec_to_extension(codec)
-        out_path = os.path.join(output_dir, f"{base}.a{idx}.{ext}")
-        if os.path.exists(out_path) and not overwrite:
-            msgs.append(f"  ⏭️ Skipped stream a:{idx} (exists)")
-            continue
-        cmd = ['ffmpeg']
-        if overwrite:
-            cmd.append('-y')
-        cmd += ['-i', input_path, '-map', f'0:a:{idx}', '-c:a', 'copy']
-        if preserve_metadata:
-            cmd.extend(['-map_metadata', '0'])
-        cmd.append(out_path)
-        try:
-            subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True)
-            created.append(out_path)
-            msgs.append(f"  ✅ Extracted stream a:{idx} -> {os.path.basename(out_path)}")
-        except subprocess.CalledProcessError as e:
-            tail = _last_stderr_line(e)
-            msgs.append(f"  ❌ Failed extracting stream a:{idx}{(' — ' + tail) if tail else ''}")
-    return created, msgs
+    """Stream-copy every audio stream (no re-encode fallback)."""
+    return extract_all_audio_streams_best_effort(
+        input_path, output_dir, overwrite=overwrite,
+        preserve_metadata=preserve_metadata, fallback_reencode=False,
+    )
+
 
+def extract_all_audio_streams_best_effort(input_path, output_dir, overwrite=False, preserve_metadata=True, max_workers=0, fallback_reencode=True):
+    """Extract every audio stream. All stream copies run in one ffmpeg call (single demux);
+    if that fails, each stream is retried on its own concurrently: copy first, then
+    re-encode that stream and report.
 
-def extract_all_audio_streams_best_effort(input_path, output_dir, overwrite=False, preserve_metadata=True, max_workers=0):
-    """Extract each audio stream concurrently. Copy first; if copy fails, re-encode that stream and report."""
+    With fallback_reencode=False a failed copy is reported instead of re-encoded.
+    """
     streams = ffprobe_audio_streams(input_path)
     if not streams:
         return [], ["  ❌ No audio streams found"]
     base = os.path.splitext(os.path.basename(input_path))[0]
+    workers = max(1, (os.cpu_count() or 4)) if not max_workers or max_workers <= 0 else max_workers
 
-    def make_worker(idx, codec):
-        ext = codec_to_extension(codec)
-        out_copy = os.path.join(output_dir, f"{base}.a{idx}.{ext}")
+    def make_worker(idx, codec, out_copy):
         def worker():
-            if os.path.exists(out_copy) and not overwrite:
-                return None, f"  ⏭️ Skipped stream a:{idx} (exists)"
             cmd = ['ffmpeg']
             if overwrite:
                 cmd.append('-y')
-            cmd += ['-i', input_path, '-map', f'0:a:{idx}', '-c:a', 'copy']
-            if preserve_metadata:
-                cmd.extend(['-map_metadata', '0'])
+            cmd += ['-i', input_path, '-map', f'0:a:{idx}', '-c:a', 'copy'] + threads
+            cmd += _metadata_args(preserve_metadata)
             cmd.append(out_copy)
-            try:
-                subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True)
+            ok, tail = _run_ffmpeg(cmd)
+            if ok:
                 return out_copy, f"  ✅ Extracted stream a:{idx} via copy -> {os.path.basename(out_copy)}"
-            except subprocess.CalledProcessError:
-                pass
+            if os.path.basename(out_copy) not in existing:
+                _remove_quiet(out_copy)  # don't leave a partial copy next to the re-encode
+            if not fallback_reencode:
+                return None, f"  ❌ Failed extracting stream a:{idx}{(' — ' + tail) if tail else ''}"
             # Re-encode fallback per stream
-            enc_map = {
-                'aac': ('aac', 'm4a'),
-                'mp3': ('libmp3lame', 'mp3'),
-                'flac': ('flac', 'flac'),
-                'opus': ('libopus', 'opus'),
-            }
-            encoder, ext2 = enc_map.get(codec, ('aac', 'm4a'))
+            encoder, ext2 = _REENCODE_MAP.get(codec, ('aac', 'm4a'))
             out_enc = os.path.join(output_dir, f"{base}.a{idx}.{ext2}")
             cmd = ['ffmpeg']
             if overwrite:
                 cmd.append('-y')
-            cmd += ['-i', input_path, '-map', f'0:a:{idx}', '-c:a', encoder]
+            cmd += threads + ['-i', input_path, '-map', f'0:a:{idx}', '-c:a', encoder] + threads
             if encoder in ('aac', 'libmp3lame', 'libopus'):
                 cmd.extend(['-b:a', '192k'])
-            if preserve_metadata:
-                cmd.extend(['-map_metadata', '0'])
+            cmd += _metadata_args(preserve_metadata)
             cmd.append(out_enc)
-            try:
-                subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True)
+            ok, tail = _run_ffmpeg(cmd)
+            if ok:
                 return out_enc, f"  ⚠️ Stream a:{idx} re-encoded -> {os.path.basename(out_enc)}"
-            except subprocess.CalledProcessError as e:
-                tail = _last_stderr_line(e)
-                return None, f"  ❌ Failed extracting stream a:{idx}{(' — ' + tail) if tail else ''}"
+            return None, f"  ❌ Failed extracting stream a:{idx}{(' — ' + tail) if tail else ''}"
         return worker
 
-    tasks = []
-    for idx, s in enumerate(streams):
-        codec = s.get('codec_name', 'unknown')
-        tasks.append(make_worker(idx, codec))
-
     created, msgs = [], []
     try:
         os.makedirs(output_dir, exist_ok=True)
     except Exception as e:
         return created, [f"  ❌ Cannot create output directory: {e}"]
 
-    workers = max(1, (os.cpu_count() or 4)) if not max_workers or max_workers <= 0 else max_workers
+    existing = _existing_names(output_dir)
+    pending = []
+    for idx, s in enumerate(streams):
+        codec = s.get('codec_name', 'unknown')
+        out_name = f"{base}.a{idx}.{codec_to_extension(codec)}"
+        out_copy = os.path.join(output_dir, out_name)
+        if out_name in existing and not overwrite:
+            msgs.append(f"  ⏭️ Skipped stream a:{idx} (exists)")
+            continue
+        pending.append((idx, codec, out_copy))
+    if not pending:
+        return created, msgs
+
+    # One ffmpeg run with an output per new stream file: the container is demuxed once.
+    # Files that already exist (overwrite=True) are kept out of it, so a failed fused
+    # run never truncates them; they go straight to the per-stream path instead.
+    fresh = [p for p in pending if os.path.basename(p[2]) not in existing]
+    retry = [p for p in pending if os.path.basename(p[2]) in existing]
+    if fresh:
+        cmd = ['ffmpeg', '-i', input_path]
+        for idx, _, out_copy in fresh:
+            cmd += ['-map', f'0:a:{idx}', '-c:a', 'copy']
+            cmd += _metadata_args(preserve_metadata)
+            cmd.append(out_copy)
+        if _run_ffmpeg(cmd)[0]:
+            for idx, _, out_copy in fresh:
+                created.append(out_copy)
+                msgs.append(f"  ✅ Extracted stream a:{idx} via copy -> {os.path.basename(out_copy)}")
+        else:
+            # Every output of the failed run was created by it; drop the partials
+            for _, _, out_copy in fresh:
+                _remove_quiet(out_copy)
+            retry = sorted(retry + fresh)
+    if not retry:
+        return created, msgs
+
+    threads = _ffmpeg_thread_args(min(workers, len(retry)))
     with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
-        futures = [executor.submit(t) for t in tasks]
+        futures = [executor.submit(make_worker(*p)) for p in retry]
         for fut in concurrent.futures.as_completed(futures):
             out_path, message = fut.result()
             if out_path:
@@ -278,16 +456,13 @@ def extract_all_audio_channels(input_path, output_dir, overwrite=False, preserve
     created = []
     msgs = []
     base = os.path.splitext(os.path.basename(input_path))[0]
+    existing = _existing_names(output_dir)
     for s_idx, s in enumerate(streams):
         codec = s.get('codec_name', 'unknown')
         channels = s.get('channels', 0) or 0
         ext = codec_to_extension(codec)
         # Only attempt per-channel stream copy for raw PCM; most compressed codecs cannot change channel count without re-encoding
-        pcm_codecs = {
-            'pcm_s8', 'pcm_u8', 'pcm_s16le', 'pcm_s16be', 'pcm_s24le', 'pcm_s24be', 'pcm_s32le', 'pcm_s32be',
-            'pcm_f32le', 'pcm_f32be', 'pcm_f64le', 'pcm_f64be'
-        }
-        if codec not in pcm_codecs:
+        if codec not in _PCM_CODECS:
             msgs.append(
                 f"  ⚠️ Skipping per-channel split for a:{s_idx} (codec={codec}) — not possible without re-encoding"
             )
@@ -296,28 +471,26 @@ def extract_all_audio_channels(input_path, output_dir, overwrite=False, preserve
         if not channels or channels == 1:
             # Single-channel: just copy the stream
             out_path = os.path.join(output_dir, f"{base}.a{s_idx}.ch0.{ext}")
-            if os.path.exists(out_path) and not overwrite:
+            if os.path.basename(out_path) in existing and not overwrite:
                 msgs.append(f"  ⏭️ Skipped channel a:{s_idx}:0 (exists)")
                 continue
             cmd = ['ffmpeg']
             if overwrite:
                 cmd.append('-y')
             cmd += ['-i', input_path, '-map', f'0:a:{s_idx}', '-c:a', 'copy']
-            if preserve_metadata:
-                cmd.extend(['-map_metadata', '0'])
+            cmd += _metadata_args(preserve_metadata)
             cmd.append(out_path)
-            try:
-                subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True)
+            ok, tail = _run_ffmpeg(cmd)
+            if ok:
                 created.append(out_path)
                 msgs.append(f"  ✅ Extracted channel a:{s_idx}:0 -> {os.path.basename(out_path)}")
-            except subprocess.CalledProcessError as e:
-                tail = _last_stderr_line(e)
+            else:
                 msgs.append(f"  ❌ Failed extracting channel a:{s_idx}:0{(' — ' + tail) if tail else ''}")
             continue
         # Multi-channel: attempt per-channel copy using -map_channel (may fail for some codecs)
         for ch in range(int(channels)):
             out_path = os.path.join(output_dir, f"{base}.a{s_idx}.ch{ch}.{ext}")
-            if os.path.exists(out_path) and not overwrite:
+            if os.path.basename(out_path) in existing and not overwrite:
                 msgs.append(f"  ⏭️ Skipped channel a:{s_idx}:{ch} (exists)")
                 continue
             cmd = ['ffmpeg']
@@ -327,94 +500,126 @@ def extract_all_audio_channels(input_path, output_dir, overwrite=False, preserve
             # Note: 0.0.ch uses first input file, first audio program; for container-index stability we also try stream-qualified form
             # Prefer stream-qualified mapping if supported by ffmpeg version
             # Fallback is the generic 0.0.ch which maps channel index within the first audio stream
-            try:
-                subprocess.run(cmd + [out_path], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True)
-                created.append(out_path)
-                msgs.append(f"  ✅ Extracted channel a:{s_idx}:{ch} -> {os.path.basename(out_path)}")
-            except subprocess.CalledProcessError:
+            ok, tail = _run_ffmpeg(cmd + [out_path])
+            if not ok:
                 # Attempt stream-qualified mapping if available: 0:a:s_idx.c:ch
                 alt_cmd = ['ffmpeg']
                 if overwrite:
                     alt_cmd.append('-y')
                 alt_cmd += ['-i', input_path, '-map_channel', f'0:a:{s_idx}.{ch}', '-c:a', 'copy', out_path]
-                try:
-                    subprocess.run(alt_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True)
-                    created.append(out_path)
-                    msgs.append(f"  ✅ Extracted channel a:{s_idx}:{ch} -> {os.path.basename(out_path)}")
-                except subprocess.CalledProcessError as e:
-                    tail = _last_stderr_line(e)
-                    msgs.append(f"  ❌ Failed extracting channel a:{s_idx}:{ch} (codec={codec}){(' — ' + tail) if tail else ''}")
+                ok, tail = _run_ffmpeg(alt_cmd)
+            if ok:
+                created.append(out_path)
+                msgs.append(f"  ✅ Extracted channel a:{s_idx}:{ch} -> {os.path.basename(out_path)}")
+            else:
+                msgs.append(f"  ❌ Failed extracting channel a:{s_idx}:{ch} (codec={codec}){(' — ' + tail) if tail else ''}")
     return created, msgs
 
 
 def split_channels_best_effort(input_path, output_dir, overwrite=False, preserve_metadata=True, max_workers=0):
     """Split channels per track concurrently.
 
-    - For PCM codecs, attempt channel copy with -map_channel. If that fails, try stream-qualified mapping.
-    - For compressed codecs, re-encode per channel using pan filter.
+    Every channel of a track comes from one ffmpeg run over an asplit+pan graph (one demux
+    and decode per track). PCM channels are written back with the track's own PCM codec, so
+    samples are unchanged; compressed codecs are re-encoded to AAC. If that run fails, fall
+    back per channel: -map_channel copy (then stream-qualified mapping) for PCM, a pan
+    re-encode otherwise.
     """
     streams = ffprobe_audio_streams(input_path)
     if not streams:
         return [], ["  ❌ No audio streams found"]
     base = os.path.splitext(os.path.basename(input_path))[0]
-    pcm_codecs = {
-        'pcm_s8', 'pcm_u8', 'pcm_s16le', 'pcm_s16be', 'pcm_s24le', 'pcm_s24be', 'pcm_s32le', 'pcm_s32be',
-        'pcm_f32le', 'pcm_f32be', 'pcm_f64le', 'pcm_f64be'
-    }
-
+    existing = _existing_names(output_dir)
     tasks = []
+    workers = max(1, (os.cpu_count() or 4)) if not max_workers or max_workers <= 0 else max_workers
 
     def make_worker(s_idx, ch, codec):
-        is_pcm = codec in pcm_codecs
+        is_pcm = codec in _PCM_CODECS
         ext = codec_to_extension(codec) if is_pcm else 'm4a'
         out_path = os.path.join(output_dir, f"{base}.a{s_idx}.ch{ch}.{ext}")
+        yes = ['-y'] if overwrite else []
+        is_new = os.path.basename(out_path) not in existing
         def worker():
-            if os.path.exists(out_path) and not overwrite:
+            if os.path.basename(out_path) in existing and not overwrite:
                 return None, f"  ⏭️ Skipped channel a:{s_idx}:{ch} (exists)"
             if is_pcm:
                 # Try generic mapping
-                cmd = ['ffmpeg', '-i', input_path, '-map_channel', f'0.0.{ch}', '-c:a', 'copy']
-                if preserve_metadata:
-                    cmd.extend(['-map_metadata', '0'])
+                cmd = ['ffmpeg'] + yes + ['-i', input_path, '-map_channel', f'0.0.{ch}', '-c:a', 'copy'] + threads
+                cmd += _metadata_args(preserve_metadata)
                 cmd.append(out_path)
-                try:
-                    subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True)
-                    return out_path, f"  ✅ Extracted channel a:{s_idx}:{ch} -> {os.path.basename(out_path)}"
-                except subprocess.CalledProcessError:
+                ok, tail = _run_ffmpeg(cmd)
+                if not ok:
+                    if is_new:
+                        _remove_quiet(out_path)  # without -y the retry would refuse a leftover partial
                     # Fallback: stream-qualified mapping
-                    alt_cmd = ['ffmpeg', '-i', input_path, '-map_channel', f'0:a:{s_idx}.{ch}', '-c:a', 'copy']
-                    if preserve_metadata:
-                        alt_cmd.extend(['-map_metadata', '0'])
+                    alt_cmd = ['ffmpeg'] + yes + ['-i', input_path, '-map_channel', f'0:a:{s_idx}.{ch}', '-c:a', 'copy'] + threads
+                    alt_cmd += _metadata_args(preserve_metadata)
                     alt_cmd.append(out_path)
-                    try:
-                        subprocess.run(alt_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True)
-                        return out_path, f"  ✅ Extracted channel a:{s_idx}:{ch} -> {os.path.basename(out_path)}"
-                    except subprocess.CalledProcessError as e:
-                        tail = _last_stderr_line(e)
-                        return None, f"  ❌ Failed extracting channel a:{s_idx}:{ch} (PCM){(' — ' + tail) if tail else ''}"
+                    ok, tail = _run_ffmpeg(alt_cmd)
+                if ok:
+                    return out_path, f"  ✅ Extracted channel a:{s_idx}:{ch} -> {os.path.basename(out_path)}"
+                return None, f"  ❌ Failed extracting channel a:{s_idx}:{ch} (PCM){(' — ' + tail) if tail else ''}"
             else:
                 # Re-encode per channel using pan
                 pan = f"pan=mono|c0=c{ch}"
-                cmd = ['ffmpeg', '-i', input_path, '-map', f'0:a:{s_idx}', '-af', pan, '-c:a', 'aac', '-b:a', '160k']
-                if preserve_metadata:
-                    cmd.extend(['-map_metadata', '0'])
+                cmd = ['ffmpeg'] + yes + threads + ['-i', input_path, '-map', f'0:a:{s_idx}', '-af', pan, '-c:a', 'aac', '-b:a', '160k'] + threads
+                cmd += _metadata_args(preserve_metadata)
                 cmd.append(out_path)
-                try:
-                    subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True)
+                ok, tail = _run_ffmpeg(cmd)
+                if ok:
                     return out_path, f"  ⚠️ Channel a:{s_idx}:{ch} re-encoded -> {os.path.basename(out_path)}"
-                except subprocess.CalledProcessError as e:
-                    tail = _last_stderr_line(e)
-                    return None, f"  ❌ Failed splitting channel a:{s_idx}:{ch}{(' — ' + tail) if tail else ''}"
+                return None, f"  ❌ Failed splitting channel a:{s_idx}:{ch}{(' — ' + tail) if tail else ''}"
         return worker
 
+    def make_stream_task(s_idx, channels, codec):
+        # All channels of one track from a single decode
+        is_pcm = codec in _PCM_CODECS
+        ext = codec_to_extension(codec) if is_pcm else 'm4a'
+        enc_args = ['-c:a', codec] if is_pcm else ['-c:a', 'aac', '-b:a', '160k']
+
+        def done(ch, out_path):
+            if is_pcm:
+                return out_path, f"  ✅ Extracted channel a:{s_idx}:{ch} -> {os.path.basename(out_path)}"
+            return out_path, f"  ⚠️ Channel a:{s_idx}:{ch} re-encoded -> {os.path.basename(out_path)}"
+
+        def task():
+            results = []
+            pending = []
+            for ch in range(channels):
+                out_path = os.path.join(output_dir, f"{base}.a{s_idx}.ch{ch}.{ext}")
+                if os.path.basename(out_path) in existing and not overwrite:
+                    results.append((None, f"  ⏭️ Skipped channel a:{s_idx}:{ch} (exists)"))
+                else:
+                    pending.append((ch, out_path))
+            # Existing files (overwrite=True) are kept out of the fused run so a failure there
+            # can't truncate them; they are redone per channel below.
+            fresh = [p for p in pending if os.path.basename(p[1]) not in existing]
+            retry = [p for p in pending if os.path.basename(p[1]) in existing]
+            if fresh:
+                graph = f"[0:a:{s_idx}]asplit={len(fresh)}" + "".join(f"[s{ch}]" for ch, _ in fresh)
+                graph += "".join(f";[s{ch}]pan=mono|c0=c{ch}[c{ch}]" for ch, _ in fresh)
+                cmd = ['ffmpeg'] + threads + ['-i', input_path, '-filter_complex', graph]
+                for ch, out_path in fresh:
+                    cmd += ['-map', f'[c{ch}]'] + enc_args + threads
+                    cmd += _metadata_args(preserve_metadata)
+                    cmd.append(out_path)
+                if _run_ffmpeg(cmd)[0]:
+                    results += [done(ch, out_path) for ch, out_path in fresh]
+                else:
+                    # Every output of the failed run was created by it; drop the partials
+                    for _, out_path in fresh:
+                        _remove_quiet(out_path)
+                    retry = sorted(retry + fresh)
+            return results + [make_worker(s_idx, ch, codec)() for ch, _ in retry]
+        return task
+
     # Build tasks for all streams/channels
     for s_idx, s in enumerate(streams):
         codec = s.get('codec_name', 'unknown')
         channels = int(s.get('channels', 0) or 0)
         if channels <= 0:
             continue
-        for ch in range(channels):
-            tasks.append(make_worker(s_idx, ch, codec))
+        tasks.append(make_stream_task(s_idx, channels, codec))
 
     created = []
     msgs = []
@@ -426,32 +631,53 @@ def split_channels_best_effort(input_path, output_dir, overwrite=False, preserve
     except Exception as e:
         return created, [f"  ❌ Cannot create output directory: {e}"]
 
-    workers = max(1, (os.cpu_count() or 4)) if not max_workers or max_workers <= 0 else max_workers
+    # Cap ffmpeg's own threads so workers x threads stays near the core count
+    threads = _ffmpeg_thread_args(min(workers, len(tasks)))
     with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
         futures = [executor.submit(t) for t in tasks]
         for fut in concurrent.futures.as_completed(futures):
-            out_path, message = fut.result()
-            if out_path:
-                created.append(out_path)
-            msgs.append(message)
+            for out_path, message in fut.result():
+                if out_path:
+                    created.append(out_path)
+                msgs.append(message)
 
     return created, msgs
 
 
-def extract_audio(video_file, output_dir, output_ext, overwrite=False, re_encode=False, target_format=None, quality=None, preserve_metadata=True):
+def extract_audio(video_file, output_dir, output_ext, overwrite=False, re_encode=False, target_format=None, quality=None, preserve_metadata=True, cover_from_video=False, cover_image=None, stem=None, threads=None):
+    """Extract the audio of video_file into output_dir.
+
+    With cover_from_video the first video frame is embedded as attached_pic in the
+    same ffmpeg run (one demux, no temporary JPEG); cover_image embeds an image file
+    the same way. Only valid for COVER_EXTS outputs. `threads` is an optional
+    ['-threads', N] list for runs sharing the CPU with other workers.
+    """
     # Create output path in specified directory
-    video_name = os.path.splitext(os.path.basename(video_file))[0]
+    video_name = stem if stem is not None else os.path.splitext(os.path.basename(video_file))[0]
     output_file = os.path.join(output_dir, f"{video_name}.{output_ext}")
 
     if os.path.exists(output_file) and not overwrite:
         return None  # Indicate skipping
 
+    # Input-side -threads caps the decoder too; the output-side copy below caps the encoder
+    inputs = (threads or []) + ['-i', video_file]
+    # The cover runs need explicit maps, which replace ffmpeg's default "best audio"
+    # pick with the first audio track (the one get_audio_codec reports). The plain
+    # audio-only run keeps the default selection.
+    if cover_from_video:
+        stream_args = ['-map', '0:a:0?', '-map', '0:v:0', '-c:v', 'mjpeg', '-q:v', '2', '-frames:v', '1'] + _COVER_STREAM_ARGS
+    elif cover_image:
+        inputs += ['-i', cover_image]
+        stream_args = ['-map', '0:a:0?', '-map', '1:v:0', '-c:v', 'copy'] + _COVER_STREAM_ARGS
+    else:
+        stream_args = ['-vn']
+
     if re_encode and target_format:
         # Re-encode with specified format and quality
         cmd = ['ffmpeg']
         if overwrite:
             cmd.append('-y')
-        cmd += ['-i', video_file, '-vn']
+        cmd += inputs + stream_args
         
         # Add format-specific encoding settings
         if target_format == 'mp3':
@@ -468,24 +694,24 @@ def extract_audio(video_file, output_dir, output_ext, overwrite=False, re_encode
             # Default to AAC if unknown format
             cmd.extend(['-c:a', 'aac', '-b:a', quality or '192k'])
         
-        if preserve_metadata:
-            cmd.extend(['-map_metadata', '0'])
+        cmd += _metadata_args(preserve_metadata)
+        if threads:
+            cmd.extend(threads)
         cmd.append(output_file)
     else:
         # No re-encoding - just copy the audio stream
         cmd = ['ffmpeg']
         if overwrite:
             cmd.append('-y')
-        cmd += ['-i', video_file, '-vn', '-c:a', 'copy']
-        if preserve_metadata:
-            cmd.extend(['-map_metadata', '0'])
+        cmd += inputs + stream_args + ['-c:a', 'copy']
+        cmd += _metadata_args(preserve_metadata)
+        if threads:
+            cmd.extend(threads)
         cmd.append(output_file)
     
-    try:
-        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True)
+    if _run_ffmpeg(cmd)[0]:
         return output_file
-    except subprocess.CalledProcessError as e:
-        return None  # Keep quiet here; higher-level caller reports a message
+    return None  # Keep quiet here; higher-level caller reports a message
 
 
 def extract_audio_best_effort(input_path, output_dir, preserve_metadata=True):
@@ -495,8 +721,7 @@ def extract_audio_best_effort(input_path, output_dir, preserve_metadata=True):
     """
     msgs = []
     codec = get_audio_codec(input_path)
-    ext_map = {"aac": "m4a", "mp3": "mp3", "flac": "flac", "opus": "opus", "pcm_s16le": "wav", "pcm_s24le": "wav", "pcm_s32le": "wav"}
-    target_ext = ext_map.get(codec, "m4a")
+    target_ext = _EXT_MAP.get(codec, "m4a")
     # Attempt copy first
     copied = extract_audio(input_path, output_dir, target_ext, overwrite=True, re_encode=False, preserve_metadata=preserve_metadata)
     if copied:
@@ -513,25 +738,94 @@ def extract_audio_best_effort(input_path, output_dir, preserve_metadata=True):
     msgs.append("  ❌ Failed to extract audio")
     return None, msgs
 
-def extract_first_frame(video_file, output_dir):
-    # Create output path in specified directory
-    video_name = os.path.splitext(os.path.basename(video_file))[0]
-    output_image = os.path.join(output_dir, f"{video_name}.jpg")
-    cmd = ["ffmpeg", "-y", "-i", video_file, "-frames:v", "1", "-q:v", "2", output_image]
+def extract_first_frame_bytes(video_file):
+    """Return the first frame as JPEG bytes read from ffmpeg's stdout (no file on disk)."""
+    # Input-side -ss so the demuxer seeks rather than decoding up to the requested position
+    cmd = ["ffmpeg"] + _QUIET_ARGS + ["-fflags", "+fastseek", "-ss", "0"] + FIRST_FRAME_INPUT_ARGS + FAST_PROBE_ARGS + [
+        "-i", video_file] + FIRST_FRAME_OUTPUT_ARGS + ["-c:v", "mjpeg", "-f", "image2pipe", "pipe:1"]
     try:
-        subprocess.run(cmd, check=True, capture_output=True, text=True)
-        return output_image
+        result = subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=_DEVNULL)
+        return result.stdout or None
     except subprocess.CalledProcessError:
         return None
 
 
-def add_album_art(audio_file, image_file):
-    temp_file = f"{audio_file}.tmp"
+def extract_first_frame(video_file, output_dir):
+    """Save the first frame as <video name>.jpg in output_dir; returns the path or None."""
+    data = extract_first_frame_bytes(video_file)
+    if not data:
+        return None
+    video_name = os.path.splitext(os.path.basename(video_file))[0]
+    output_image = os.path.join(output_dir, f"{video_name}.jpg")
+    with open(output_image, 'wb') as fh:
+        fh.write(data)
+    return output_image
+
+
+def _embed_cover_mutagen(audio_file, data):
+    """Write the cover into the tag block in place. Returns False for formats it does not handle."""
+    file_ext = os.path.splitext(audio_file)[1].lower()
+    if file_ext not in ('.mp3', '.m4a', '.mp4', '.flac'):
+        return False
+    is_png = data[:8] == b'\x89PNG\r\n\x1a\n'
+    mime = 'image/png' if is_png else 'image/jpeg'
+
+    m = _mutagen()
+    if file_ext == '.mp3':
+        try:
+            tags = m.ID3(audio_file)
+        except m.ID3NoHeaderError:
+            tags = m.ID3()
+        tags.delall('APIC')
+        tags.add(m.APIC(encoding=3, mime=mime, type=3, desc='Cover', data=data))
+        tags.save(audio_file, padding=_id3_padding)
+    elif file_ext in ('.m4a', '.mp4'):
+        audio = m.MP4(audio_file)
+        fmt = m.MP4Cover.FORMAT_PNG if is_png else m.MP4Cover.FORMAT_JPEG
+        audio['covr'] = [m.MP4Cover(data, imageformat=fmt)]
+        audio.save()
+    else:
+        audio = m.FLAC(audio_file)
+        pic = m.Picture()
+        pic.type = 3  # front cover
+        pic.mime = mime
+        pic.desc = 'Cover'
+        pic.data = data
+        audio.clear_pictures()
+        audio.add_picture(pic)
+        audio.save()
+    return True
+
+
+def add_album_art(audio_file, image_file=None, image_data=None):
+    """Embed a cover given as a file path or as raw image bytes."""
+    if image_data is None:
+        with open(image_file, 'rb') as fh:
+            image_data = fh.read()
+
+    # Tag-only edit when mutagen can handle the container; ffmpeg remux otherwise
+    if _mutagen() is not None:
+        try:
+            if _embed_cover_mutagen(audio_file, image_data):
+                return True
+        except Exception:
+            pass
+
     file_ext = os.path.splitext(audio_file)[1][1:]
+    if file_ext.lower() not in COVER_EXTS:
+        # The remux could only fail for these containers; don't write a doomed temp copy
+        return False
+    # ffmpeg cannot overwrite its own input, so the remux still needs a sibling temp file.
+    # Same directory keeps os.replace a rename; a unique name keeps concurrent runs apart.
+    fd, temp_file = tempfile.mkstemp(
+        prefix=os.path.basename(audio_file) + '.', suffix='.tmp',
+        dir=os.path.dirname(audio_file) or '.')
+    os.close(fd)
     output_format = 'mp4' if file_ext == 'm4a' else file_ext
 
+    # The image is fed through stdin so callers never need it on disk
     cmd = [
-        'ffmpeg', '-i', audio_file, '-i', image_file,
+        'ffmpeg', '-i', audio_file, '-i', 'pipe:0',
         '-c', 'copy', '-map', '0', '-map', '1',
         '-disposition:v:0', 'attached_pic',
         '-metadata:s:v:0', 'title=Album cover',
@@ -539,14 +833,173 @@ def add_album_art(audio_file, image_file):
         '-metadata:s:v:0', 'mimetype=image/jpeg',
         '-f', output_format, '-y', temp_file
     ]
-    try:
-        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if _run_ffmpeg(cmd, input=image_data)[0]:
         os.replace(temp_file, audio_file)
         return True
-    except subprocess.CalledProcessError:
-        if os.path.exists(temp_file):
-            os.remove(temp_file)
-        return False
+    if os.path.exists(temp_file):
+        os.remove(temp_file)
+    return False
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _scan_dir(dirpath, ext_set):
+    """Sorted path strings of regular files in dirpath whose lowercased suffix is in ext_set.
+
+    One readdir pass; DirEntry.is_file() uses the cached entry type where the OS provides it.
+    """
+    with os.scandir(dirpath) as entries:
+        return sorted(
+            e.path for e in entries
+            if os.path.splitext(e.name)[1].lower() in ext_set and e.is_file()
+        )
+
+
+def _scan_dir_cached(dirpath, ext_set):
+    """_scan_dir result reused until dirpath's mtime changes (entries added, removed or renamed)."""
+    try:
+        mtime_ns = os.stat(dirpath).st_mtime_ns
+    except OSError:
+        return ()
+    return _scan_dir_at(dirpath, ext_set, mtime_ns)
+
+
+@functools.lru_cache(maxsize=32)
+def _scan_dir_at(dirpath, ext_set, mtime_ns):
+    return tuple(_scan_dir(dirpath, ext_set))
+
+
+def _process_one_video(
+        index: int,
+        total: int,
+        video_file: str,
+        input_directory: str,
+        output_directory: str,
+        use_first_frame_as_cover: bool,
+        delete_original_video: bool,
+        overwrite_existing_files: bool,
+        add_metadata_tags: bool,
+        re_encode_audio: bool,
+        target_audio_format: str,
+        audio_quality: str,
+        external_cover_image_path: str = None,
+        preserve_metadata: bool = True,
+        ffmpeg_threads: list = None
+):
+    """Run the full pipeline for one video. Returns (status_lines, audio_path_or_None)."""
+    # Path pieces computed once and reused by every step below
+    src = video_file
+    file_name = os.path.basename(src)
+    video_name = os.path.splitext(file_name)[0]
+    lines = [f"[{index}/{total}] Processing: {file_name}"]
+    audio_path = None
+
+    try:
+        if re_encode_audio:
+            # Use user-specified format and quality
+            target_ext = target_audio_format
+        else:
+            # Detect original codec and use appropriate extension
+            codec = get_audio_codec(src)
+            target_ext = _EXT_MAP.get(codec, "m4a")
+        
+        # Create expected output path
+        expected_audio_output_path = os.path.join(output_directory, f"{video_name}.{target_ext}")
+        
+        if os.path.exists(expected_audio_output_path) and not overwrite_existing_files:
+            lines.append(f"  ⏭️ Skipped: Audio file already exists")
+            return lines, None
+
+        extract_kwargs = dict(
+            re_encode=re_encode_audio,
+            target_format=target_audio_format if re_encode_audio else None,
+            quality=audio_quality if re_encode_audio else None,
+            preserve_metadata=preserve_metadata,
+            stem=video_name,
+            threads=ffmpeg_threads,
+        )
+        audio_path = None
+        cover_embedded = False
+        if use_first_frame_as_cover and target_ext in COVER_EXTS:
+            # Single ffmpeg run: audio + first frame as attached_pic
+            audio_path = extract_audio(src, output_directory, target_ext,
+                                       overwrite=True, cover_from_video=True, **extract_kwargs)
+            cover_embedded = audio_path is not None
+        elif external_cover_image_path is not None and re_encode_audio and target_ext in COVER_EXTS:
+            # We are encoding anyway: mux the cover in now instead of re-muxing afterwards
+            audio_path = extract_audio(src, output_directory, target_ext,
+                                       overwrite=True, cover_image=external_cover_image_path, **extract_kwargs)
+            cover_embedded = audio_path is not None
+        if audio_path is None:
+            # No cover requested, unsupported container, or the input has no video stream
+            audio_path = extract_audio(src, output_directory, target_ext,
+                                       overwrite=True, **extract_kwargs)
+
+        if audio_path is None:
+            lines.append(f"  ❌ Failed to extract audio")
+            return lines, None
+        
+        lines.append(f"  ✅ Audio extracted to {os.path.basename(audio_path)}")
+        
+        # Handle album art
+        if use_first_frame_as_cover and cover_embedded:
+            lines.append("  ✅ Album art (first frame) embedded during extraction.")
+        elif use_first_frame_as_cover and target_ext not in COVER_EXTS:
+            lines.append(f"  ⏭️ Album art skipped: .{target_ext} cannot hold a cover.")
+        elif use_first_frame_as_cover:
+            lines.append("  Extracting first frame for cover...")
+            img = extract_first_frame_bytes(src)
+            if img:
+                if add_album_art(audio_path, image_data=img):
+                    lines.append("  ✅ Album art (first frame) embedded.")
+                else:
+                    lines.append("  ❌ Failed to embed album art (first frame).")
+            else:
+                lines.append("  ❌ Could not extract first frame for album art.")
+        elif external_cover_image_path is not None and cover_embedded:
+            lines.append("  ✅ Album art (external) embedded during encode.")
+        elif external_cover_image_path is not None:
+            lines.append("  Embedding external album art...")
+            external_image_path = external_cover_image_path
+            ok = add_album_art(audio_path, external_image_path)
+            if ok:
+                lines.append("  ✅ Album art (external) embedded.")
+            else:
+                lines.append("  ❌ Failed to embed external album art.")
+        else:
+            lines.append("  ⏭️ Album art embedding skipped.")
+        
+        # Add metadata tags
+        if add_metadata_tags:
+            lines.append("  Adding metadata tags...")
+            success, result = set_title_from_filename(audio_path, stem=video_name)
+            if success:
+                lines.append(f"  ✅ Metadata tagged: {result}")
+            else:
+                lines.append(f"  ⚠️ Metadata tagging failed: {result}")
+        else:
+            lines.append("  ⏭️ Metadata tagging skipped.")
+        
+        # Delete original video (only if input and output are the same directory)
+        if delete_original_video and input_directory == output_directory:
+            try:
+                os.unlink(src)
+                lines.append(f"  🗑️ Original video deleted.")
+            except OSError as e:
+                lines.append(f"  ❌ Failed to delete original video: {e}")
+        elif delete_original_video:
+            lines.append(f"  ⚠️ Skipped deleting original (different input/output directories)")
+        
+    except Exception as e:
+        lines.append(f"  ❌ Error: {e}")
+    
+    lines.append("")  # Empty line for readability
+    return lines, audio_path
 
 
 def process_videos_in_directory(
@@ -561,17 +1014,22 @@ def process_videos_in_directory(
         target_audio_format: str,
         audio_quality: str,
         external_cover_image_path: str = None,
-        preserve_metadata: bool = True
+        preserve_metadata: bool = True,
+        max_workers: int = None,
+        progress=gr.Progress(track_tqdm=False)
 ):
     """
     Processes all video files in the specified input directory.
+    Yields the status log after each file so the UI updates as work completes;
+    per-file blocks are emitted in input order. max_workers defaults to the CPU count.
     """
     status_messages = []
     processed_files = []
     
     # Validate directories
     if not input_directory or not os.path.exists(input_directory):
-        return "❌ Input directory does not exist or is not specified."
+        yield "❌ Input directory does not exist or is not specified."
+        return
     
     if not output_directory:
         output_directory = input_directory  # Default to same directory
@@ -580,28 +1038,29 @@ def process_videos_in_directory(
     try:
         os.makedirs(output_directory, exist_ok=True)
     except Exception as e:
-        return f"❌ Cannot create output directory: {e}"
+        yield f"❌ Cannot create output directory: {e}"
+        return
     
-    # Find all video files in the input directory
-    video_files = []
-    for ext in VIDEO_EXTS:
-        video_files.extend(Path(input_directory).glob(f"*{ext}"))
+    # Find all video files in the input directory (one directory read for all extensions)
+    video_files = _scan_dir(input_directory, VIDEO_EXT_SET)
     
     if not video_files:
-        return f"No video files found in: {input_directory}"
+        yield f"No video files found in: {input_directory}"
+        return
 
     # If a selection is provided, filter to only those files; otherwise process all
     if selected_files:
         selected_set = set(selected_files)
-        video_files = [p for p in video_files if (p.name in selected_set or str(p) in selected_set)]
+        video_files = [p for p in video_files if (os.path.basename(p) in selected_set or p in selected_set)]
         if not video_files:
-            return "No matching selected files in directory."
+            yield "No matching selected files in directory."
+            return
     
     status_messages.append(f"📁 Input directory: {input_directory}")
     status_messages.append(f"📁 Output directory: {output_directory}")
     status_messages.append(f"🎬 Found {len(video_files)} video files to process:")
     for video_file in video_files:
-        status_messages.append(f"  - {video_file.name}")
+        status_messages.append(f"  - {os.path.basename(video_file)}")
     
     # Show encoding settings
     if re_encode_audio:
@@ -611,106 +1070,86 @@ def process_videos_in_directory(
     
     status_messages.append("\n" + "="*60 + "\n")
     
-    for i, video_file in enumerate(video_files, 1):
-        status_messages.append(f"[{i}/{len(video_files)}] Processing: {video_file.name}")
-        
-        try:
-            if re_encode_audio:
-                # Use user-specified format and quality
-                target_ext = target_audio_format
-            else:
-                # Detect original codec and use appropriate extension
-                codec = get_audio_codec(str(video_file))
-                ext_map = {"aac": "m4a", "mp3": "mp3", "flac": "flac", "opus": "opus"}
-                target_ext = ext_map.get(codec, "m4a")
-            
-            # Create expected output path
-            video_name = video_file.stem
-            expected_audio_output_path = Path(output_directory) / f"{video_name}.{target_ext}"
-            
-            audio_path = extract_audio(
-                str(video_file), 
-                output_directory, 
-                target_ext, 
-                overwrite=overwrite_existing_files,
-                re_encode=re_encode_audio,
-                target_format=target_audio_format if re_encode_audio else None,
-                quality=audio_quality if re_encode_audio else None,
-                preserve_metadata=preserve_metadata
-            )
-            
-            if audio_path is None:
-                if expected_audio_output_path.exists() and not overwrite_existing_files:
-                    status_messages.append(f"  ⏭️ Skipped: Audio file already exists")
-                else:
-                    status_messages.append(f"  ❌ Failed to extract audio")
-                continue
-            
-            status_messages.append(f"  ✅ Audio extracted to {os.path.basename(audio_path)}")
-            processed_files.append(audio_path)
-            
-            # Handle album art
-            if use_first_frame_as_cover:
-                status_messages.append("  Extracting first frame for cover...")
-                img = extract_first_frame(str(video_file), output_directory)
-                if img:
-                    ok = add_album_art(audio_path, img)
-                    # Clean up the temporary image file after embedding
-                    try:
-                        os.remove(img)
-                        status_messages.append("  ✅ Album art (first frame) embedded and cleaned up.")
-                    except OSError:
-                        status_messages.append("  ✅ Album art (first frame) embedded (cleanup failed).")
-                    if not ok:
-                        status_messages.append("  ❌ Failed to embed album art (first frame).")
-                else:
-                    status_messages.append("  ❌ Could not extract first frame for album art.")
-            elif external_cover_image_path is not None:
-                status_messages.append("  Embedding external album art...")
-                external_image_path = external_cover_image_path
-                ok = add_album_art(audio_path, external_image_path)
-                if ok:
-                    status_messages.append("  ✅ Album art (external) embedded.")
-                else:
-                    status_messages.append("  ❌ Failed to embed external album art.")
-            else:
-                status_messages.append("  ⏭️ Album art embedding skipped.")
-            
-            # Add metadata tags
-            if add_metadata_tags:
-                status_messages.append("  Adding metadata tags...")
-                success, result = set_title_from_filename(audio_path)
-                if success:
-                    status_messages.append(f"  ✅ Metadata tagged: {result}")
-                else:
-                    status_messages.append(f"  ⚠️ Metadata tagging failed: {result}")
-            else:
-                status_messages.append("  ⏭️ Metadata tagging skipped.")
-            
-            # Delete original video (only if input and output are the same directory)
-            if delete_original_video and input_directory == output_directory:
-                try:
-                    video_file.unlink()
-                    status_messages.append(f"  🗑️ Original video deleted.")
-                except OSError as e:
-                    status_messages.append(f"  ❌ Failed to delete original video: {e}")
-            elif delete_original_video:
-                status_messages.append(f"  ⚠️ Skipped deleting original (different input/output directories)")
-            
-        except Exception as e:
-            status_messages.append(f"  ❌ Error: {e}")
-        
-        status_messages.append("")  # Empty line for readability
+    options = dict(
+        input_directory=input_directory,
+        output_directory=output_directory,
+        use_first_frame_as_cover=use_first_frame_as_cover,
+        delete_original_video=delete_original_video,
+        overwrite_existing_files=overwrite_existing_files,
+        add_metadata_tags=add_metadata_tags,
+        re_encode_audio=re_encode_audio,
+        target_audio_format=target_audio_format,
+        audio_quality=audio_quality,
+        external_cover_image_path=external_cover_image_path,
+        preserve_metadata=preserve_metadata,
+    )
+    total = len(video_files)
+    # ffmpeg runs out of process, so threads are enough to keep every core busy
+    workers = max(1, min(int(max_workers or 0) or os.cpu_count() or 4, total))
+    options['ffmpeg_threads'] = _ffmpeg_thread_args(workers)
+    jobs = list(enumerate(video_files, 1))
+    if total > workers:
+        # Longest-processing-time first: big files start early instead of becoming the tail
+        jobs.sort(key=lambda job: _file_size(job[1]), reverse=True)
+    yield "\n".join(status_messages)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(_process_one_video, i, total, video_file, **options): (i, video_file)
+            for i, video_file in jobs
+        }
+        # Hold finished blocks until every earlier file has been reported
+        finished = {}
+        next_index = 1
+        for done, fut in enumerate(concurrent.futures.as_completed(futures), 1):
+            index, video_file = futures[fut]
+            lines, audio_path = fut.result()
+            finished[index] = lines
+            while next_index in finished:
+                status_messages.extend(finished.pop(next_index))
+                next_index += 1
+            if audio_path:
+                processed_files.append(audio_path)
+            progress(done / total, desc=os.path.basename(video_file))
+            yield "\n".join(status_messages)
     
     status_messages.append("="*60)
     status_messages.append(f"🎉 Processing complete! {len(processed_files)} files processed successfully.")
     status_messages.append(f"📁 Output location: {output_directory}")
     
-    return "\n".join(status_messages)
+    yield "\n".join(status_messages)
+
+
+def _run_per_file(files, outdir, job, max_workers=0):
+    """Run job(path, out_dir, inner_workers) -> log block for each file concurrently.
+
+    out_dir is outdir or the file's own folder; inner_workers is the share of cores left
+    for the per-stream/per-channel pool inside each job. Blocks are yielded in input order
+    as soon as each one (and every block before it) is ready.
+    """
+    workers = max(1, min(int(max_workers or 0) or os.cpu_count() or 4, len(files)))
+    inner_workers = max(1, (os.cpu_count() or workers) // workers)
+
+    # Create each distinct output folder once, not once per file
+    failed_dirs = {}
+    for od in {outdir or os.path.dirname(f) for f in files}:
+        try:
+            os.makedirs(od, exist_ok=True)
+        except Exception as e:
+            failed_dirs[od] = e
+
+    def run(f):
+        od = outdir or os.path.dirname(f)
+        if od in failed_dirs:
+            return f"📄 {os.path.basename(f)}\n❌ Cannot create output directory: {failed_dirs[od]}"
+        return job(f, od, inner_workers)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(run, files)
 
 
 # Define the Gradio interface
-with gr.Blocks() as demo:
+# Uploaded cover images pile up in Gradio's cache; sweep hourly, dropping files older than an hour
+with gr.Blocks(delete_cache=(3600, 3600)) as demo:
     gr.Markdown("# Audio Extractor")
 
     with gr.Row():
@@ -791,6 +1230,14 @@ with gr.Blocks() as demo:
                 label="Overwrite existing audio files",
                 value=False
             )
+            parallel_jobs_slider = gr.Slider(
+                label="Parallel jobs",
+                minimum=1,
+                maximum=os.cpu_count() or 4,
+                value=os.cpu_count() or 4,
+                step=1,
+                info="Files processed at the same time"
+            )
 
             process_button = gr.Button("🚀 Start Processing", variant="primary", size="lg")
 
@@ -826,7 +1273,8 @@ with gr.Blocks() as demo:
             target_format_dropdown,
             quality_dropdown,
             external_cover_input,
-            preserve_metadata_checkbox
+            preserve_metadata_checkbox,
+            parallel_jobs_slider
         ],
         outputs=[
             status_output,
@@ -834,94 +1282,79 @@ with gr.Blocks() as demo:
     )
 
     # Helpers wired to shared inputs
+    # Listings come from one cached scandir pass per directory version
     def _list_media_in_dir(dirpath):
-        files = []
-        for ext in VIDEO_EXTS + AUDIO_EXTS:
-            files.extend(sorted(Path(dirpath).glob(f"*{ext}")))
-        return [str(p) for p in files]
+        return list(_scan_dir_cached(dirpath, MEDIA_EXT_SET))
 
     def _update_file_choices(dirpath):
         if not dirpath or not os.path.isdir(dirpath):
             return gr.update(choices=[], value=[])
-        files = []
-        for ext in VIDEO_EXTS:
-            files.extend([p.name for p in sorted(Path(dirpath).glob(f"*{ext}"))])
+        files = [os.path.basename(p) for p in _scan_dir_cached(dirpath, VIDEO_EXT_SET)]
         return gr.update(choices=files, value=[])
 
+    # The Tools handlers are generators so each file's report streams into the log box
+    def _stream_blocks(blocks):
+        log = []
+        for block in blocks:
+            log.append(block)
+            yield "\n\n".join(log)
+
     def _scan(dirpath, selected):
-        if not dirpath or not os.path.isdir(dirpath):
-            return "❌ Path not found or no media files"
-        files = _list_media_in_dir(dirpath)
+        files = _resolve_targets(dirpath, selected)
         if not files:
-            return "❌ Path not found or no media files"
-        if selected:
-            files = [str(Path(dirpath) / s) for s in selected if (Path(dirpath) / s).exists()]
-        reports = [scan_file_tracks_and_channels(f) for f in files]
-        return "\n\n".join(reports)
+            yield "❌ Path not found or no media files"
+            return
+        yield from _stream_blocks(scan_files_batch(files))
 
     def _resolve_targets(dirpath, selected):
         if not dirpath or not os.path.isdir(dirpath):
             return []
         files = _list_media_in_dir(dirpath)
         if selected:
-            files = [str(Path(dirpath) / s) for s in selected if (Path(dirpath) / s).exists()]
+            wanted = set(selected)
+            files = [f for f in files if os.path.basename(f) in wanted]
         return files
 
-    def _extract_main(dirpath, selected, outdir, overwrite, preserve_meta):
+    def _extract_main(dirpath, selected, outdir, overwrite, preserve_meta, max_jobs):
         files = _resolve_targets(dirpath, selected)
         if not files:
-            return "❌ Path not found or no media files"
-        log = []
-        for f in files:
-            od = outdir or os.path.dirname(f)
-            try:
-                os.makedirs(od, exist_ok=True)
-            except Exception as e:
-                log.append(f"📄 {os.path.basename(f)}\n❌ Cannot create output directory: {e}")
-                continue
+            yield "❌ Path not found or no media files"
+            return
+
+        def job(f, od, inner_workers):
             out, msgs = extract_audio_best_effort(f, od, preserve_metadata=preserve_meta)
             header = f"📄 {os.path.basename(f)}\n📁 Output: {od}\nResult: {'OK' if out else 'FAILED'}"
-            log.append("\n".join([header] + msgs))
-        return "\n\n".join(log)
+            return "\n".join([header] + msgs)
+        yield from _stream_blocks(_run_per_file(files, outdir, job, max_jobs))
 
-    def _extract_tracks(dirpath, selected, outdir, overwrite, preserve_meta):
+    def _extract_tracks(dirpath, selected, outdir, overwrite, preserve_meta, max_jobs):
         files = _resolve_targets(dirpath, selected)
         if not files:
-            return "❌ Path not found or no media files"
-        log = []
-        for f in files:
-            od = outdir or os.path.dirname(f)
-            try:
-                os.makedirs(od, exist_ok=True)
-            except Exception as e:
-                log.append(f"📄 {os.path.basename(f)}\n❌ Cannot create output directory: {e}")
-                continue
-            created, msgs = extract_all_audio_streams_best_effort(f, od, overwrite=overwrite, preserve_metadata=preserve_meta, max_workers=0)
+            yield "❌ Path not found or no media files"
+            return
+
+        def job(f, od, inner_workers):
+            created, msgs = extract_all_audio_streams_best_effort(f, od, overwrite=overwrite, preserve_metadata=preserve_meta, max_workers=inner_workers)
             header = f"📄 {os.path.basename(f)}\n📁 Output: {od}\nCreated: {len(created)} file(s)"
-            log.append("\n".join([header] + msgs))
-        return "\n\n".join(log)
+            return "\n".join([header] + msgs)
+        yield from _stream_blocks(_run_per_file(files, outdir, job, max_jobs))
 
-    def _split_channels(dirpath, selected, outdir, overwrite, preserve_meta):
+    def _split_channels(dirpath, selected, outdir, overwrite, preserve_meta, max_jobs):
         files = _resolve_targets(dirpath, selected)
         if not files:
-            return "❌ Path not found or no media files"
-        log = []
-        for f in files:
-            od = outdir or os.path.dirname(f)
-            try:
-                os.makedirs(od, exist_ok=True)
-            except Exception as e:
-                log.append(f"📄 {os.path.basename(f)}\n❌ Cannot create output directory: {e}")
-                continue
-            created, msgs = split_channels_best_effort(f, od, overwrite=overwrite, preserve_metadata=preserve_meta, max_workers=0)
+            yield "❌ Path not found or no media files"
+            return
+
+        def job(f, od, inner_workers):
+            created, msgs = split_channels_best_effort(f, od, overwrite=overwrite, preserve_metadata=preserve_meta, max_workers=inner_workers)
             header = f"📄 {os.path.basename(f)}\n📁 Output: {od}\nCreated: {len(created)} file(s)"
-            log.append("\n".join([header] + msgs))
-        return "\n\n".join(log)
+            return "\n".join([header] + msgs)
+        yield from _stream_blocks(_run_per_file(files, outdir, job, max_jobs))
 
     scan_button.click(fn=_scan, inputs=[input_dir_input, file_selector], outputs=[scan_output])
     input_dir_input.change(fn=_update_file_choices, inputs=[input_dir_input], outputs=[file_selector])
-    extract_main_button.click(fn=_extract_main, inputs=[input_dir_input, file_selector, output_dir_input, overwrite_checkbox, preserve_metadata_checkbox], outputs=[extract_output])
-    extract_streams_button.click(fn=_extract_tracks, inputs=[input_dir_input, file_selector, output_dir_input, overwrite_checkbox, preserve_metadata_checkbox], outputs=[extract_output])
-    split_channels_button.click(fn=_split_channels, inputs=[input_dir_input, file_selector, output_dir_input, overwrite_checkbox, preserve_metadata_checkbox], outputs=[extract_output])
+    extract_main_button.click(fn=_extract_main, inputs=[input_dir_input, file_selector, output_dir_input, overwrite_checkbox, preserve_metadata_checkbox, parallel_jobs_slider], outputs=[extract_output])
+    extract_streams_button.click(fn=_extract_tracks, inputs=[input_dir_input, file_selector, output_dir_input, overwrite_checkbox, preserve_metadata_checkbox, parallel_jobs_slider], outputs=[extract_output])
+    split_channels_button.click(fn=_split_channels, inputs=[input_dir_input, file_selector, output_dir_input, overwrite_checkbox, preserve_metadata_checkbox, parallel_jobs_slider], outputs=[extract_output])
 
 demo.launch()
@@ -3,11 +3,15 @@ from tkinter import ttk, messagebox
 from pynput import keyboard, mouse
 import time
 import threading
+import collections
 import json
 import os
 import sys
 from pathlib import Path
 
+# Timestamps are time.perf_counter_ns() ints; convert to ms only for display/comparison.
+NS_PER_MS = 1_000_000
+
 # no need for backwards compatibility with previous versions of the code. we are still in development phase
 
 class ComboTrackerApp:
@@ -18,21 +22,25 @@ class ComboTrackerApp:
 
         # --- Data & State ---
         self.combos = {}
+        # Mirror of the Combobox values, so it's only reconfigured when the names change.
+        self._combo_names = []
         self.active_combo_name = None
         self.active_combo_tokens = []
-        self.active_combo_steps = []
+        self.active_combo_steps = ()
+        self._expected_labels = ()
         self.current_index = 0
         self.start_time = 0
         self.last_input_time = 0
-        self.is_listening = True
+        # Read by the listener callbacks: stays False (events dropped) until a combo is active.
+        self.is_listening = False
         self.hold_in_progress = False
         self.hold_expected_input = None
-        self.hold_started_at = 0.0
+        self.hold_started_at = 0
         self.hold_row_id = None
         self.hold_required_ms = None
         self.wait_in_progress = False
-        self.wait_started_at = 0.0
-        self.wait_until = 0.0
+        self.wait_started_at = 0
+        self.wait_until = 0
         self.wait_row_id = None
         self.wait_required_ms = None
         self.currently_pressed = set()
@@ -40,6 +48,14 @@ class ComboTrackerApp:
         # Combo enders: key -> grace_ms (0 means no grace; wrong press drops immediately)
         self.combo_enders = {}
         self.last_success_input = None
+        # Listener threads only append (pressed, input, timestamp) here; the Tk thread drains it.
+        self._event_q = collections.deque()
+        self._drain_job = None
+        # Scroll/status changes made while handling events are applied once per drain tick.
+        self._scroll_pending = False
+        self._pending_status = None
+        # Special keys (space, enter, shift, ...) -> name, so normalize_key needs no try/except.
+        self._special = {k: sys.intern(k.name.lower()) for k in keyboard.Key}
 
         # --- Persistence ---
         self.data_dir = self._get_data_dir()
@@ -123,14 +139,17 @@ class ComboTrackerApp:
         # Recompute min-time while editing.
         self.entry_keys.bind("<KeyRelease>", lambda _e: self.update_min_time_from_editor())
 
+        # Start polling the listener event queue.
+        self._drain_queue()
+
     # --- Input Normalization ---
 
     def normalize_key(self, key):
         """Convert keyboard events to readable strings"""
-        try:
-            return key.char.lower()
-        except AttributeError:
-            return key.name.lower() # e.g., space, enter, shift
+        ch = getattr(key, "char", None)
+        if ch:
+            return ch.lower()
+        return self._special.get(key, "") # e.g., space, enter, shift
 
     def normalize_mouse(self, button):
         """Convert mouse objects to LMB, RMB, MMB strings"""
@@ -320,7 +339,7 @@ class ComboTrackerApp:
         name = self.active_combo_name or "Combo"
         label = f"—— {name} | Attempt {self.attempt_counter} ——"
         self.tree.insert("", "end", values=(label, "", ""), tags=("sep",))
-        self.tree.yview_moveto(1)
+        self._scroll_pending = True
 
     def _is_combo_ender(self, input_name: str) -> bool:
         return input_name in self.combo_enders
@@ -332,23 +351,22 @@ class ComboTrackerApp:
         except Exception:
             return 0
 
-    def _within_ender_grace(self, input_name: str) -> bool:
+    def _within_ender_grace(self, input_name: str, now: int) -> bool:
         grace_ms = self._ender_grace_for(input_name)
         if not grace_ms or grace_ms <= 0:
             return False
         if not self.last_input_time:
             return False
-        now = time.perf_counter()
-        return ((now - self.last_input_time) * 1000) <= float(grace_ms)
+        return (now - self.last_input_time) <= grace_ms * NS_PER_MS
 
-    def _should_ignore_ender_miss(self, input_name: str) -> bool:
+    def _should_ignore_ender_miss(self, input_name: str, now: int) -> bool:
         """
         Grace windows are meant for "spam" of the most recent correct input (e.g. pressing 2 twice),
         not for random wrong buttons (e.g. pressing 2 after hitting f).
         """
-        return (input_name == self.last_success_input) and self._within_ender_grace(input_name)
+        return (input_name == self.last_success_input) and self._within_ender_grace(input_name, now)
 
-    def _start_hold(self, input_name: str, required_ms: int, now: float):
+    def _start_hold(self, input_name: str, required_ms: int, now: int):
         self.hold_in_progress = True
         self.hold_expected_input = input_name
         self.hold_started_at = now
@@ -361,7 +379,7 @@ class ComboTrackerApp:
             "end",
             values=(f"{input_name} (hold ≥ {req_s})", "HOLDING", "..."),
         )
-        self.tree.yview_moveto(1)
+        self._scroll_pending = True
 
         self.update_status(
             f"Holding '{input_name.upper()}' (≥ {req_s}). Release OR press next input to continue...",
@@ -371,16 +389,16 @@ class ComboTrackerApp:
     def _reset_hold_state(self):
         self.hold_in_progress = False
         self.hold_expected_input = None
-        self.hold_started_at = 0.0
+        self.hold_started_at = 0
         self.hold_row_id = None
         self.hold_required_ms = None
 
     def _start_wait(self, required_ms: int):
         # Wait timing starts from the last successful step time.
         self.wait_in_progress = True
-        self.wait_started_at = float(self.last_input_time or time.perf_counter())
+        self.wait_started_at = self.last_input_time or time.perf_counter_ns()
         self.wait_required_ms = required_ms
-        self.wait_until = self.wait_started_at + (required_ms / 1000.0)
+        self.wait_until = self.wait_started_at + required_ms * NS_PER_MS
 
         req_s = self._format_wait_requirement(required_ms)
         self.wait_row_id = self.tree.insert(
@@ -389,27 +407,27 @@ class ComboTrackerApp:
             values=(f"wait (≥ {req_s})", "WAITING", "..."),
             tags=("sep",),
         )
-        self.tree.yview_moveto(1)
+        self._scroll_pending = True
         self.update_status(f"Waiting ≥ {req_s}...", "green")
 
     def _reset_wait_state(self):
         self.wait_in_progress = False
-        self.wait_started_at = 0.0
-        self.wait_until = 0.0
+        self.wait_started_at = 0
+        self.wait_until = 0
         self.wait_row_id = None
         self.wait_required_ms = None
 
-    def _complete_wait(self, now: float, *, fail: bool, reason: str | None = None):
+    def _complete_wait(self, now: int, *, fail: bool, reason: str | None = None):
         """
         Complete (or fail) the current wait step and advance/reset state.
         When successful, advances current_index by 1.
         """
         required_ms = int(self.wait_required_ms or 0)
-        waited_ms = max(0.0, (now - self.wait_started_at) * 1000)
+        waited_ms = max(0.0, (now - self.wait_started_at) / NS_PER_MS)
         req_s = self._format_wait_requirement(required_ms) if required_ms else "?"
         label = f"wait (≥ {req_s}, {waited_ms:.0f}ms)"
 
-        total_ms = (now - self.start_time) * 1000 if self.start_time else 0.0
+        total_ms = (now - self.start_time) / NS_PER_MS if self.start_time else 0.0
 
         if fail:
             if reason:
@@ -418,7 +436,7 @@ class ComboTrackerApp:
                 self.tree.item(self.wait_row_id, values=(label, "FAIL", "FAIL"))
             else:
                 self.tree.insert("", "end", values=(label, "FAIL", "FAIL"))
-            self.tree.yview_moveto(1)
+            self._scroll_pending = True
             self.update_status("Combo Dropped (Too Early)", "red")
             self.current_index = 0
             self._reset_hold_state()
@@ -426,12 +444,12 @@ class ComboTrackerApp:
             return False
 
         # success
-        split_ms = (now - self.last_input_time) * 1000 if self.last_input_time else 0.0
+        split_ms = (now - self.last_input_time) / NS_PER_MS if self.last_input_time else 0.0
         if self.wait_row_id:
             self.tree.item(self.wait_row_id, values=(label, f"{split_ms:.1f}", f"{total_ms:.1f}"))
         else:
             self.record_hit(label, split_ms, total_ms)
-        self.tree.yview_moveto(1)
+        self._scroll_pending = True
 
         self.last_input_time = now
         # wait is not a real input; do not change last_success_input
@@ -449,7 +467,7 @@ class ComboTrackerApp:
             if not self.wait_in_progress:
                 self._start_wait(int(wait_ms))
 
-    def _complete_hold(self, now: float, *, auto: bool):
+    def _complete_hold(self, now: int, *, auto: bool):
         """
         Complete the current hold-step (either via release or auto-complete when next input happens).
         Assumes we're currently on a hold-step and hold_in_progress is True.
@@ -461,12 +479,12 @@ class ComboTrackerApp:
         target_input = step["input"]
         target_hold_ms = step["hold_ms"]
 
-        held_ms = (now - self.hold_started_at) * 1000
+        held_ms = (now - self.hold_started_at) / NS_PER_MS
         ok = held_ms >= float(target_hold_ms)
 
         req_s = self._format_hold_requirement(target_hold_ms)
-        split_ms = (now - self.last_input_time) * 1000 if self.current_index != 0 else 0.0
-        total_ms = (now - self.start_time) * 1000
+        split_ms = (now - self.last_input_time) / NS_PER_MS if self.current_index != 0 else 0.0
+        total_ms = (now - self.start_time) / NS_PER_MS
 
         label = f"{target_input} (hold ≥ {req_s}, {held_ms:.0f}ms)"
         if auto:
@@ -475,7 +493,7 @@ class ComboTrackerApp:
         if ok:
             if self.hold_row_id:
                 self.tree.item(self.hold_row_id, values=(label, f"{split_ms:.1f}", f"{total_ms:.1f}"))
-                self.tree.yview_moveto(1)
+                self._scroll_pending = True
             else:
                 self.record_hit(label, split_ms, total_ms)
 
@@ -491,30 +509,32 @@ class ComboTrackerApp:
         else:
             if self.hold_row_id:
                 self.tree.item(self.hold_row_id, values=(label, "FAIL", "FAIL"))
-                self.tree.yview_moveto(1)
             else:
                 self.tree.insert("", "end", values=(label, "FAIL", "FAIL"))
 
             self.update_status("Combo Dropped (Hold Too Short)", "red")
-            self.tree.yview_moveto(1)
+            self._scroll_pending = True
             self.current_index = 0
 
         self._reset_hold_state()
         return ok
 
-    def process_press(self, input_name):
-        """Handle press/down events for both Mouse and Keyboard"""
+    def process_press(self, input_name, now: int):
+        """Handle press/down events for both Mouse and Keyboard (now = listener timestamp)"""
         self.currently_pressed.add(input_name)
-        if not self.active_combo_steps:
+        steps = self.active_combo_steps
+        if not steps:
             return
+        n_steps = len(steps)
 
         # If we're currently on a hold-step and the hold requirement is already satisfied,
         # allow the user to press the next input without releasing the held key.
         # This is common in games (hold-through inputs).
         while True:
-            step = self._active_step()
-            if not step:
+            idx = self.current_index
+            if not 0 <= idx < n_steps:
                 return
+            step = steps[idx]
 
             target_input = step["input"]
             target_hold_ms = step["hold_ms"]
@@ -523,7 +543,6 @@ class ComboTrackerApp:
             # WAIT step handling
             if target_wait_ms is not None:
                 self._maybe_start_wait_step()
-                now = time.perf_counter()
                 if now < self.wait_until:
                     # Too early: only ender presses fail; everything else is ignored.
                     if self._is_combo_ender(input_name):
@@ -538,9 +557,7 @@ class ComboTrackerApp:
                 if input_name == target_input:
                     return
 
-                now = time.perf_counter()
-                held_ms = (now - self.hold_started_at) * 1000
-                if held_ms >= float(target_hold_ms):
+                if now - self.hold_started_at >= target_hold_ms * NS_PER_MS:
                     # Auto-complete the hold and then re-evaluate this same input against the next step.
                     self._complete_hold(now, auto=True)
                     continue
@@ -550,7 +567,6 @@ class ComboTrackerApp:
         # 1. Start of Combo
         if self.current_index == 0:
             if input_name == target_input:
-                now = time.perf_counter()
                 self._insert_attempt_separator()
                 self.start_time = now
                 self.last_input_time = now
@@ -568,13 +584,13 @@ class ComboTrackerApp:
 
         # 2. During Combo
         else:
-            current_time = time.perf_counter()
-            
+            current_time = now
+
             if input_name == target_input:
                 if target_hold_ms is None:
                     # HIT (press)
-                    split_ms = (current_time - self.last_input_time) * 1000
-                    total_ms = (current_time - self.start_time) * 1000
+                    split_ms = (current_time - self.last_input_time) / NS_PER_MS
+                    total_ms = (current_time - self.start_time) / NS_PER_MS
 
                     self.record_hit(input_name, split_ms, total_ms)
 
@@ -583,7 +599,7 @@ class ComboTrackerApp:
                     self.current_index += 1
                     self._maybe_start_wait_step()
 
-                    if self.current_index >= len(self.active_combo_steps):
+                    if self.current_index >= n_steps:
                         self.update_status(f"Combo '{self.active_combo_name}' Complete!", "green")
                         self.current_index = 0
                 else:
@@ -593,18 +609,18 @@ class ComboTrackerApp:
                 # MISS
                 if self._is_combo_ender(input_name):
                     # Allow spamming this ender key ONLY if it's the last successful input.
-                    if self._should_ignore_ender_miss(input_name):
+                    if self._should_ignore_ender_miss(input_name, current_time):
                         return
-                    self.tree.insert("", "end", values=(f"{input_name} (Exp: {target_input})", "FAIL", "FAIL"))
+                    self.tree.insert("", "end", values=(input_name + self._expected_labels[idx], "FAIL", "FAIL"))
                     self.update_status("Combo Dropped (Wrong Input)", "red")
-                    self.tree.yview_moveto(1)
+                    self._scroll_pending = True
                     self.current_index = 0
                     self._reset_hold_state()
                 else:
                     # Non-ender inputs are ignored (useful for games where many keys do nothing).
                     return
 
-    def process_release(self, input_name):
+    def process_release(self, input_name, now: int):
         """Handle key/button release events for hold-steps."""
         self.currently_pressed.discard(input_name)
         if not self.active_combo_steps:
@@ -626,26 +642,48 @@ class ComboTrackerApp:
         if input_name != target_input:
             return
 
-        now = time.perf_counter()
         self._complete_hold(now, auto=False)
 
     # --- Event Callbacks ---
 
+    # These run on the listener threads: timestamp + enqueue only, no Tk calls
+    # (Tkinter isn't thread-safe and a slow callback stalls the OS input hook).
+
     def on_key_press(self, key):
-        key_name = self.normalize_key(key)
-        # Schedule the logic on the main thread (Tkinter isn't thread-safe)
-        self.root.after(0, lambda: self.process_press(key_name))
+        if not self.is_listening:
+            return
+        self._event_q.append((True, self.normalize_key(key), time.perf_counter_ns()))
 
     def on_key_release(self, key):
-        key_name = self.normalize_key(key)
-        self.root.after(0, lambda: self.process_release(key_name))
+        if not self.is_listening:
+            return
+        self._event_q.append((False, self.normalize_key(key), time.perf_counter_ns()))
 
     def on_mouse_click(self, x, y, button, pressed):
-        btn_name = self.normalize_mouse(button)
-        if pressed:
-            self.root.after(0, lambda: self.process_press(btn_name))
-        else:
-            self.root.after(0, lambda: self.process_release(btn_name))
+        if not self.is_listening:
+            return
+        self._event_q.append((pressed, self.normalize_mouse(button), time.perf_counter_ns()))
+
+    def _drain_queue(self):
+        """Process queued input events on the Tk thread, then re-arm the poller."""
+        q = self._event_q
+        try:
+            for _ in range(min(len(q), 64)):
+                pressed, input_name, now = q.popleft()
+                if pressed:
+                    self.process_press(input_name, now)
+                else:
+                    self.process_release(input_name, now)
+        finally:
+            # One scroll and one status relayout per tick, however many rows were added.
+            if self._scroll_pending:
+                self._scroll_pending = False
+                self.tree.yview_moveto(1)
+            if self._pending_status:
+                text, color = self._pending_status
+                self._pending_status = None
+                self.lbl_status.config(text=text, fg=color)
+            self._drain_job = self.root.after(16, self._drain_queue)
 
     # --- GUI Helpers ---
 
@@ -653,12 +691,13 @@ class ComboTrackerApp:
         """Clear editor fields and deselect active combo (start a new preset)."""
         self.active_combo_name = None
         self.active_combo_tokens = []
-        self.active_combo_steps = []
+        self.active_combo_steps = ()
+        self.is_listening = False
         self.combo_selector.set("")
         self.entry_name.delete(0, tk.END)
         self.entry_keys.delete(0, tk.END)
         self.reset_tracking()
-        self.lbl_status.config(text="Status: Select a combo to start", fg="gray")
+        self.update_status("Status: Select a combo to start", "gray")
         self.update_min_time_label([])
 
     def save_combo(self):
@@ -673,7 +712,7 @@ class ComboTrackerApp:
             return
 
         # Parse inputs (comma-separated, but respect hold(e,0.2) commas)
-        input_list = [k.strip().lower() for k in self.split_inputs(keys_str) if k.strip()]
+        input_list = tuple(k.strip().lower() for k in self.split_inputs(keys_str) if k.strip())
         if not input_list:
             messagebox.showerror("Error", "Please provide at least one input.")
             return
@@ -703,13 +742,17 @@ class ComboTrackerApp:
                     return
             self.combos[name] = input_list
         
-        self.combo_selector['values'] = list(self.combos.keys())
+        self._refresh_combo_names()
         self.combo_selector.set(name)
         self.set_active_combo(None)
         self.save_combos()
         
     def set_active_combo(self, event):
         name = self.combo_selector.get()
+        # Re-selecting the active combo in the dropdown changes nothing; keep its results.
+        # (Explicit calls pass event=None and always reload, e.g. after Save / Update.)
+        if event is not None and name == self.active_combo_name:
+            return
         if name in self.combos:
             self.active_combo_name = name
             self.active_combo_tokens = self.combos[name]
@@ -717,8 +760,14 @@ class ComboTrackerApp:
             for t in self.active_combo_tokens:
                 s = self.parse_step(t)
                 if s:
+                    # Interned so the per-press target comparison is usually an identity check.
+                    if s["input"]:
+                        s["input"] = sys.intern(s["input"])
                     steps.append(s)
-            self.active_combo_steps = steps
+            self.active_combo_steps = tuple(steps)
+            # Suffix for the wrong-input row, per step index.
+            self._expected_labels = tuple(f" (Exp: {s['input']})" for s in steps)
+            self.is_listening = bool(steps)
             self.update_min_time_label(self.active_combo_steps)
 
             # Populate editor fields for easy editing.
@@ -731,9 +780,9 @@ class ComboTrackerApp:
             first = self.active_combo_steps[0]
             start_key = first["input"].upper()
             if first["hold_ms"] is None:
-                self.lbl_status.config(text=f"Ready! Press '{start_key}' to start.", fg="blue")
+                self.update_status(f"Ready! Press '{start_key}' to start.", "blue")
             else:
-                self.lbl_status.config(text=f"Ready! Hold '{start_key}' for {first['hold_ms']}ms to start.", fg="blue")
+                self.update_status(f"Ready! Hold '{start_key}' for {first['hold_ms']}ms to start.", "blue")
 
     def delete_active_combo(self):
         name = self.combo_selector.get().strip()
@@ -746,7 +795,7 @@ class ComboTrackerApp:
             return
 
         del self.combos[name]
-        self.combo_selector["values"] = list(self.combos.keys())
+        self._refresh_combo_names()
         self.save_combos()
         self.new_combo()
 
@@ -758,15 +807,24 @@ class ComboTrackerApp:
         self.last_success_input = None
         self._reset_hold_state()
         self._reset_wait_state()
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
 
     def record_hit(self, name, split, total):
         self.tree.insert("", "end", values=(name, f"{split:.1f}", f"{total:.1f}"))
-        self.tree.yview_moveto(1)
+        self._scroll_pending = True
+
+    def _refresh_combo_names(self):
+        names = list(self.combos)
+        if names != self._combo_names:
+            self._combo_names = names
+            self.combo_selector["values"] = names
 
     def update_status(self, text, color):
-        self.lbl_status.config(text=text, fg=color)
+        # The only way the status label changes: applied by _drain_queue, and the last
+        # status set before a tick wins (so a stale event status can't override a UI one).
+        self._pending_status = (text, color)
 
     # --- Persistence Helpers ---
 
@@ -792,10 +850,10 @@ class ComboTrackerApp:
                 for name, seq in combos.items():
                     if not isinstance(name, str) or not isinstance(seq, list):
                         continue
-                    sanitized[name] = [str(x).strip().lower() for x in seq if str(x).strip()]
+                    sanitized[name] = tuple(str(x).strip().lower() for x in seq if str(x).strip())
                 self.combos = sanitized
 
-            self.combo_selector["values"] = list(self.combos.keys())
+            self._refresh_combo_names()
 
             enders = data.get("combo_enders", {})
             parsed = {}
@@ -835,7 +893,7 @@ class ComboTrackerApp:
         except Exception:
             # If the save file is corrupt or unreadable, just start fresh.
             self.combos = {}
-            self.combo_selector["values"] = []
+            self._refresh_combo_names()
 
     def save_combos(self):
         try:
@@ -902,14 +960,20 @@ class ComboTrackerApp:
             self.mouse_listener.stop()
         except Exception:
             pass
+        # Stop the queue poller so no after() callback fires into a destroyed root.
+        if self._drain_job is not None:
+            self.root.after_cancel(self._drain_job)
+            self._drain_job = None
 
         # Persist ender edits even if the user didn't click Save/Update.
         try:
             self.apply_enders(show_status=False)
         except Exception:
             pass
-        self.save_combos()
-        self.root.destroy()
+        try:
+            self.save_combos()
+        finally:
+            self.root.destroy()
 
 if __name__ == "__main__":
     root = tk.Tk()
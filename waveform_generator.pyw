@@ -50,7 +50,7 @@ def process_file(file, input_folder, waveform_params):
         return (file, f"Critical error: {str(e)}")
 
 def generate_waveforms(input_folder):
-    audio_extensions = ('.mp3', '.wav', '.flac', '.ogg', '.m4a', '.aac')
+    audio_extensions = frozenset(('.mp3', '.wav', '.flac', '.ogg', '.m4a', '.aac'))
     waveform_params = {
         'colors': '#007bff|#ff0000',
         'size': '2500x300',
@@ -58,10 +58,13 @@ def generate_waveforms(input_folder):
         'dynamic_range': True,
     }
     
-    files_to_process = [
-        file for file in os.listdir(input_folder)
-        if file.lower().endswith(audio_extensions)
-    ]
+    # scandir's cached d_type skips directories without an extra stat per entry
+    with os.scandir(input_folder) as entries:
+        files_to_process = [
+            entry.name for entry in entries
+            # only the extension is case-folded, not the whole name
+            if os.path.splitext(entry.name)[1].lower() in audio_extensions and entry.is_file()
+        ]
     
     with ProcessPoolExecutor() as executor:
         futures = []